@@ -1,7 +1,7 @@
 import pandas as pd
 import re
 import numpy as np
-from functools import reduce
+from itertools import chain
 
 # for plot
 from math import ceil, sqrt
@@ -12,6 +12,82 @@ from plotnine import (
     scale_y_discrete
 )
 
+# Compiled once and shared by every call: parses draws columns such as "beta[1,2]"
+_PAR_PATTERN = re.compile(r"^([1-9]+)?\.?([a-zA-Z0-9_.]+)\[([0-9]+),([0-9]+)")
+
+# Split summary row names such as "beta[1,2]" into variable, x and (optional) y
+_SUMMARY_XY_PATTERN = re.compile(r"^([^\[]+)\[(\d+),(\d+)\]")
+_SUMMARY_X_PATTERN = re.compile(r"^([^\[]+)\[(\d+)")
+
+# Contrast parsing in mutate_from_expr_list
+_FRAC_RE = re.compile(r"[0-9]+/[0-9]+\s?\*")
+_DEC_RE = re.compile(r"[-+]?[0-9]+\.[0-9]+\s?\*")
+_OP_SPLIT_RE = re.compile(r"[+\-/*]")
+_PAREN_SPACE_RE = re.compile(r"[\(\)\s]")
+_NUMBER_RE = re.compile(r"^[-+]?[0-9]+(\.[0-9]+)?(/[0-9]+)?$")
+_IDENT_RE = re.compile(r"^[a-zA-Z0-9_]+$")
+_PY_IDENT_RE = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+
+# Compiled parameter patterns, keyed by the `par` string
+_KEY_CACHE = {}
+
+def _par_regex(par):
+    pattern = _KEY_CACHE.get(par)
+    if pattern is None:
+        pattern = _KEY_CACHE[par] = re.compile(par)
+    return pattern
+
+# Target number of long-format rows melted at a time in draws_to_tibble_x_y
+_DRAWS_CHUNK_ROWS = 65536
+
+def _melt_draws_chunk(block, par_cols, x, y):
+
+    # Pivot longer to reshape the DataFrame, renaming and selecting relevant columns
+    block_long = block.melt(var_name="parameter", value_name="value", value_vars=par_cols, id_vars = ['chain__', 'iter__', 'draw__'])
+
+    # Extract chain, variable, x, and y indices from the parameter string
+    block_long[['chain', 'variable', x, y]] = block_long['parameter'].str.extract(_PAR_PATTERN)
+
+    # Convert extracted x and y values to int64 integers
+    block_long[[x, y]] = block_long[[x, y]].apply(pd.to_numeric).astype(np.int64)
+
+    # Categorical variable name, one shared category across blocks
+    block_long['variable'] = block_long['variable'].astype('category')
+
+    # Keep only the output columns, so the parsed strings are freed before concatenation
+    return block_long[['chain__', 'iter__', 'draw__', 'variable', x, y, 'value']]
+
+def _draw_ids(fit):
+
+    # chain__, iter__ and draw__ as cmdstanpy lays out draws: chains stacked one after another
+    n_chains, n_iter = fit.chains, fit.num_draws_sampling
+    return pd.DataFrame({
+        'chain__': np.repeat(np.arange(1, n_chains + 1), n_iter),
+        'iter__': np.tile(np.arange(1, n_iter + 1), n_chains),
+        'draw__': np.arange(1, n_chains * n_iter + 1)
+    })
+
+def _dense_cumcount(codes):
+
+    if len(codes[0]) == 0:
+        return np.empty(0, dtype=np.int32)
+
+    # Dense linear key over small non-negative integer codes, e.g. ((variable * n_x) + x) * n_y + y
+    key = np.zeros(len(codes[0]), dtype=np.int64)
+    for c in codes:
+        key = key * (int(c.max()) + 1) + c
+
+    # Stable sort keeps row order within each key, so the rank follows that order
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+    starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+    counts = np.diff(np.r_[starts, len(key)])
+
+    rank = np.empty(len(key), dtype=np.int32)
+    rank[order] = np.arange(len(key)) - np.repeat(starts, counts)
+
+    return rank
+
 #' draws_to_tibble_x_y
 #'
 #'
@@ -24,32 +100,44 @@ from plotnine import (
 #' @noRd
 def draws_to_tibble_x_y(fit, par, x, y, number_of_draws = None):
 
-    # Extract parameter names that match the specified pattern
-    par_names = [var for var in fit.stan_variables().keys() if re.search(par, var)]
-
-    # Extract draws for the specified parameter and convert to DataFrame format
-    draws_df = fit.draws_pd([par, 'chain__', 'iter__', 'draw__'])
-
-    # Pivot longer to reshape the DataFrame, renaming and selecting relevant columns
-    draws_long = draws_df.melt(var_name="parameter", value_name="value", value_vars=[col for col in draws_df.columns if par in col], id_vars = ['chain__', 'iter__', 'draw__'])
+    # Columns of the parameter of interest, e.g. "beta[1,2]" but not "beta_raw[1,2]"
+    par_regex = _par_regex("^" + re.escape(par) + r"\[")
+
+    # Extract draws for the specified parameter only and convert to DataFrame format
+    par_idx = [i for i, col in enumerate(fit.column_names) if par_regex.match(col)]
+    par_cols = [fit.column_names[i] for i in par_idx]
+    # Select the columns before stacking chains, so other variables (e.g. log_lik) are never flattened
+    par_draws = fit.draws()[:, :, par_idx]
+    n_iter, n_chains = par_draws.shape[:2]
+    par_draws = par_draws.transpose(1, 0, 2).reshape(n_chains * n_iter, len(par_idx))
+    draws_df = pd.concat([_draw_ids(fit), pd.DataFrame(par_draws, columns=par_cols)], axis=1)
+
+    # Pivot longer block by block, so the long frame is never built all at once
+    chunk = max(1, _DRAWS_CHUNK_ROWS // max(1, len(par_cols)))
+    pieces = [
+        _melt_draws_chunk(draws_df.iloc[start:start + chunk], par_cols, x, y)
+        for start in range(0, len(draws_df), chunk)
+    ]
+    draws_long = pd.concat(pieces, ignore_index=True)
+
+    # Number draws within each (variable, x, y); rows are already in chain and iteration order
+    draws_long['draw__'] = _dense_cumcount(
+        (draws_long['variable'].cat.codes.to_numpy(), draws_long[x].to_numpy(), draws_long[y].to_numpy())
+    ) + 1
 
-    # Extract chain, variable, x, and y indices from the parameter string
-    pattern = r"([1-9]+)?\.?([a-zA-Z0-9_\.]+)\[([0-9]+),([0-9]+)"
-    draws_long[['chain', 'variable', x, y]] = draws_long['parameter'].str.extract(pattern)
+    return draws_long
 
-    # Convert extracted x and y values to integers
-    draws_long[x] = draws_long[x].astype(int)
-    draws_long[y] = draws_long[y].astype(int)
+def _beta_draws_wide(fit):
 
-    # Sort and prepare the DataFrame
-    draws_long = draws_long.sort_values(by=['variable', x, y, 'chain__'])
-    draws_long = draws_long.groupby(['variable', x, y]).apply(lambda df: df.assign(draw__=range(1, len(df) + 1))).reset_index(drop=True)
+    # cmdstanpy returns matrix[C, M] draws as an (ndraws, C, M) array, no column names to parse
+    arr = fit.stan_variable('beta')
+    n_c = arr.shape[1]
+    ids = _draw_ids(fit)
 
-    # Select relevant columns and filter by the parameter of interest
-    draws_long = draws_long[['chain__', 'iter__', 'draw__', 'variable', x, y, 'value']]
-    draws_long = draws_long[draws_long['variable'] == par]
+    # One copy into a Fortran-ordered (ndraws * M, C) array, so each factor column is contiguous
+    arr = arr.transpose(1, 0, 2).reshape(n_c, -1).T
 
-    return draws_long
+    return ids, arr  # rows ordered by draw, then M
 
 def summary_to_tibble(fit, par, x, y = None, probs = (5, 25, 50, 75, 95)):
     
@@ -59,31 +147,23 @@ def summary_to_tibble(fit, par, x, y = None, probs = (5, 25, 50, 75, 95)):
     # Get the summary DataFrame
     summary = fit.summary(probs)
 
-    # Select only the desired columns
-    filtered_summary = summary.loc[summary.index.str.contains(par)]
+    # Rows of the parameter, e.g. "beta[1,2]" but not "beta_raw[1,2]"
+    if par.isidentifier():
+        mask = summary.index.str.startswith(par + "[")
+    else:
+        mask = summary.index.str.match(_par_regex(par + r"\["))
 
     # Convert probs to column names like "5%", "25%", etc.
     prob_cols = [f"{p}%" for p in probs] 
     columns_to_keep = ["Mean"] + prob_cols + ['N_Eff', 'R_hat']
+    columns_to_keep = [col for col in columns_to_keep if col in summary.columns]
 
-    columns_to_keep = [col for col in columns_to_keep if col in filtered_summary.columns]
-    filtered_summary = filtered_summary[columns_to_keep]
-
-    # Reset the index and store the old index in a new column called 'variable'
-    filtered_summary = filtered_summary.reset_index().rename(columns={"index": "variable"})
+    # Slice rows and columns at once, storing the old index in a new column called 'variable'
+    filtered_summary = summary.loc[mask, columns_to_keep].rename_axis("variable").reset_index()
 
     # Split variable names into '.variable', x, and (optional) y
-    def split_variable_name(var_name):
-        parts = re.split(r"\[|\]|,|\s", var_name)
-        parts = [p for p in parts if p]  # Remove empty strings
-        if y:
-            return parts[:3]  # Keep .variable, x, and y
-        else:
-            return parts[:2]  # Keep .variable and x
-    
-    # Apply splitting logic
-    split_cols = filtered_summary["variable"].apply(split_variable_name)
-    split_df = pd.DataFrame(split_cols.tolist(), columns=["variable", x] + ([y] if y else []))
+    split_df = filtered_summary["variable"].str.extract(_SUMMARY_XY_PATTERN if y else _SUMMARY_X_PATTERN)
+    split_df.columns = ["variable", x] + ([y] if y else [])
 
     # Ensure x and y are integers
     split_df[x] = split_df[x].astype(int)
@@ -114,23 +194,23 @@ def mutate_from_expr_list(x, formula_expr, ignore_errors = True):
     # Process contrast elements by removing fractions, decimals, and splitting expressions
     def clean_contrast_elements(expr):
 
-        expr = re.sub(r"[0-9]+/[0-9]+\s?\*", "", expr)  # Remove fractions (e.g., "3/4 *")
-        expr = re.sub(r"[-+]?[0-9]+\.[0-9]+\s?\*", "", expr)  # Remove decimals (e.g., "1.5 *")
-        elements = re.split(r"[+\-/*]", expr)  # Split by operators
-        elements = [re.sub(r"[\(\)\s]", "", e) for e in elements]  # Remove parentheses and spaces
+        expr = _FRAC_RE.sub("", expr)  # Remove fractions (e.g., "3/4 *")
+        expr = _DEC_RE.sub("", expr)  # Remove decimals (e.g., "1.5 *")
+        elements = _OP_SPLIT_RE.split(expr)  # Split by operators
+        elements = [_PAREN_SPACE_RE.sub("", e) for e in elements]  # Remove parentheses and spaces
 
         # Remove elements that are purely numbers (integers, fractions, or decimals)
         filtered_elements = [
             e for e in elements 
-            if not re.match(r"^[-+]?[0-9]+(\.[0-9]+)?(/[0-9]+)?$", e)
+            if not _NUMBER_RE.match(e)
         ]
         return filtered_elements
 
-    contrast_elements = reduce(lambda a, b: a + b, [clean_contrast_elements(f) for f in formula_expr.values()], [])
+    contrast_elements = list(chain.from_iterable(clean_contrast_elements(f) for f in formula_expr.values()))
 
     # Check if backquotes are required (columns with special characters)
     def requires_backquotes(element):
-        return not re.match(r"^[a-zA-Z0-9_]+$", element)  # Only valid chars for column names
+        return not _IDENT_RE.match(element)  # Only valid chars for column names
 
     invalid_contrasts = [e for e in contrast_elements if requires_backquotes(e) or e not in parameter_names]
     if invalid_contrasts:
@@ -141,20 +221,24 @@ def mutate_from_expr_list(x, formula_expr, ignore_errors = True):
     if missing_contrasts and not ignore_errors:
         raise ValueError(f"These contrasts are not present in the DataFrame: {missing_contrasts}")
 
-    # Function to escape column names with backticks if they contain special characters
-    def escape_column_names(formula, columns):
-        for col in columns:
-            if not re.match(r"^[a-zA-Z_][a-zA-Z0-9_]*$", col):  # Matches valid Python identifiers
-                escaped_col = f"`{col}`"
-                formula = formula.replace(col, escaped_col)
+    # Columns with special characters are passed to eval as local variables under safe names,
+    # so the formula needs no backtick-quoted names; names built once for all formulas
+    safe_names = {col: f"_col{i}" for i, col in enumerate(c for c in parameter_names if not _PY_IDENT_RE.match(c))}
+
+    # Function to replace column names containing special characters with their local variable
+    def escape_column_names(formula):
+        for col, safe in safe_names.items():
+            formula = formula.replace(col, f"@{safe}")
         return formula
 
     # Apply formulas to mutate the DataFrame
     def mutate_with_formula(df, column_name, formula):
         try:
             # Escape column names with special characters
-            formula = escape_column_names(formula, parameter_names)
-            df[column_name] = df.eval(formula)
+            formula = escape_column_names(formula)
+            # Bound from the current df, so earlier formulas overwriting a column are seen
+            local_columns = {safe: df[col].to_numpy() for col, safe in safe_names.items()}
+            df[column_name] = df.eval(formula, local_dict=local_columns)
         except Exception as e:
             if not ignore_errors:
                 raise e
@@ -182,13 +266,16 @@ def get_abundance_contrast_draws(
 
     # Beta
     beta_factor_of_interest = data.get('model_input').get("X").columns.tolist()
-    beta = draws_to_tibble_x_y(fit, "beta", "C", "M")
-    beta = beta.pivot(index = ['chain__', 'iter__', 'draw__', 'variable', 'M'], columns='C', values='value')
-    beta.columns = beta_factor_of_interest
-    beta.reset_index(inplace=True)
+    beta_ids, beta_wide = _beta_draws_wide(fit)
+    n_m = len(beta_wide) // len(beta_ids)
+
+    # One row per (chain, iter, draw, M), one column per factor
+    n_draws = len(beta_ids)
+    beta_ids = pd.DataFrame(np.repeat(beta_ids.to_numpy(), n_m, axis=0), columns=beta_ids.columns)
+    beta_ids['M'] = np.tile(np.arange(1, n_m + 1), n_draws)
 
-    # Abundance
-    draws = beta.drop(columns=['variable'], errors='ignore')
+    # Abundance, wrapping the column-major beta draws without copying
+    draws = pd.concat([beta_ids, pd.DataFrame(beta_wide, columns=beta_factor_of_interest, copy=False)], axis=1, copy=False)
 
     # Random effect
     n_random_eff = model_input.get('n_random_eff', 0)